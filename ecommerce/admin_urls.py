@@ -0,0 +1,7 @@
+# Loaded lazily by ecommerce/urls.py in lean startup mode, so the admin (and
+# every app's admin.py) is only imported once an /admin/ URL is resolved.
+from django.contrib import admin
+
+admin.autodiscover()
+
+urlpatterns, app_name, _ = admin.site.urls
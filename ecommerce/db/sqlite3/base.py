@@ -0,0 +1,63 @@
+"""
+SQLite backend with a production profile.
+
+Extends Django's backend with two extra ``OPTIONS`` keys:
+
+* ``pragmas``: mapping of PRAGMA name to value, applied to every new
+  connection (WAL journal, synchronous level, busy timeout, cache and mmap
+  sizes, ...).
+* ``transaction_mode``: ``DEFERRED`` (SQLite's default), ``IMMEDIATE`` or
+  ``EXCLUSIVE``, used for ``BEGIN`` when Django opens a transaction. It can
+  also be switched per block with ``ecommerce.db.transaction.immediate_atomic``.
+"""
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+PRAGMA_NAME_RE = re.compile(r'^[a-z_]+$')
+
+
+def apply_pragmas(conn, pragmas):
+    for name, value in pragmas.items():
+        if not PRAGMA_NAME_RE.match(name):
+            raise ImproperlyConfigured(f'Invalid SQLite pragma name: {name!r}')
+        conn.execute(f'PRAGMA {name} = {value}')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        options = self.settings_dict['OPTIONS']
+        self.pragmas = dict(options.get('pragmas') or {})
+        self.transaction_mode = self._check_transaction_mode(options.get('transaction_mode'))
+
+    @staticmethod
+    def _check_transaction_mode(mode):
+        if mode is None:
+            return None
+        mode = mode.upper()
+        if mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f'transaction_mode must be one of {", ".join(TRANSACTION_MODES)}, not {mode!r}'
+            )
+        return mode
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        kwargs.pop('pragmas', None)
+        kwargs.pop('transaction_mode', None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        apply_pragmas(conn, self.pragmas)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode is None:
+            super()._start_transaction_under_autocommit()
+        else:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
@@ -0,0 +1,27 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+@contextmanager
+def immediate_atomic(using=None):
+    """
+    ``transaction.atomic()`` that takes SQLite's write lock up front.
+
+    A deferred SQLite transaction that reads and then writes can fail with
+    "database is locked" when another connection wrote in between; starting
+    with ``BEGIN IMMEDIATE`` makes it wait on ``busy_timeout`` instead. On
+    other databases, or inside an existing transaction, this is plain atomic().
+    """
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    if not hasattr(connection, 'transaction_mode') or connection.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+    previous = connection.transaction_mode
+    connection.transaction_mode = 'IMMEDIATE'
+    try:
+        with transaction.atomic(using=using):
+            yield
+    finally:
+        connection.transaction_mode = previous
@@ -1,12 +1,24 @@
 from pathlib import Path
 import os
-import dj_database_url
-from dotenv import load_dotenv
-
-load_dotenv()
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+if (BASE_DIR / '.env').exists():
+    from dotenv import load_dotenv
+    load_dotenv(BASE_DIR / '.env')
+
+
+# ==============================
+# STARTUP
+# ==============================
+
+# Lean startup trims cold-start time for serverless deploys (on by default on
+# Vercel): the Cloudinary apps are not installed (the media storage backend
+# is still imported on first use), and the admin is only autodiscovered the
+# first time an /admin/ URL is resolved. Measure with
+# `python manage.py profile_startup`.
+LEAN_STARTUP = os.environ.get('LEAN_STARTUP', 'True' if os.environ.get('VERCEL') else 'False') == 'True'
+
 
 # ==============================
 # SECURITY
@@ -29,18 +41,23 @@ SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 # ==============================
 
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    'django.contrib.admin.apps.SimpleAdminConfig' if LEAN_STARTUP else 'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+]
 
-    # Third-party
-    'cloudinary_storage',
-    'cloudinary',
+# Third-party
+if not LEAN_STARTUP:
+    INSTALLED_APPS += [
+        'cloudinary_storage',
+        'cloudinary',
+    ]
 
-    # Local apps
+# Local apps
+INSTALLED_APPS += [
     'store',
 ]
 
@@ -57,6 +74,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'store.profiler.ProfilerMiddleware',
+    'store.ratelimit.RateLimitMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -97,6 +116,8 @@ WSGI_APPLICATION = 'ecommerce.wsgi.application'
 DATABASE_URL = os.environ.get('DATABASE_URL')
 
 if DATABASE_URL:
+    import dj_database_url
+
     DATABASES = {
         'default': dj_database_url.parse(
             DATABASE_URL,
@@ -105,14 +126,100 @@ if DATABASE_URL:
         )
     }
 else:
+    # Production SQLite profile: WAL lets readers run alongside the single
+    # writer, and busy_timeout makes writers wait instead of failing with
+    # "database is locked". Checkout uses BEGIN IMMEDIATE on top of this.
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+        'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -20000)),
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 134217728)),
+        'temp_store': 'MEMORY',
+    }
     DATABASES = {
         'default': {
-            'ENGINE': 'django.db.backends.sqlite3',
+            'ENGINE': 'ecommerce.db.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': int(os.environ.get('SQLITE_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pragmas': SQLITE_PRAGMAS,
+                'transaction_mode': os.environ.get('SQLITE_TRANSACTION_MODE'),
+            },
         }
     }
 
 
+# ==============================
+# CACHE
+# ==============================
+
+# Local memory is per process; point CACHE_BACKEND/CACHE_LOCATION at a shared
+# backend (e.g. file-based or Redis) when running several workers so page
+# cache purges reach all of them.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+PAGE_CACHE_ENABLED = os.environ.get('PAGE_CACHE_ENABLED', 'True') == 'True'
+PAGE_CACHE_TIMEOUT = int(os.environ.get('PAGE_CACHE_TIMEOUT', 600))
+PAGE_CACHE_ALIAS = 'default'
+
+
+# ==============================
+# ORDER ARCHIVE
+# ==============================
+
+# `python manage.py archive_orders` (run from cron) moves finished orders
+# older than this into the archive tables.
+ORDER_ARCHIVE_AFTER_DAYS = int(os.environ.get('ORDER_ARCHIVE_AFTER_DAYS', 180))
+ORDER_ARCHIVE_STATUSES = ['delivered', 'cancelled']
+
+
+# ==============================
+# RATE LIMITING
+# ==============================
+
+# Token buckets per user (or per IP when anonymous), keyed by URL name; see
+# store/ratelimit.py. Use the 'cache' backend with a shared CACHES backend to
+# limit across workers, 'memory' for the cheapest per-process limiter.
+RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', 'True') == 'True'
+RATELIMIT_BACKEND = os.environ.get('RATELIMIT_BACKEND', 'cache')
+# Behind a proxy that sets it (e.g. Vercel), use 'HTTP_X_FORWARDED_FOR'.
+RATELIMIT_IP_META = os.environ.get('RATELIMIT_IP_META', 'REMOTE_ADDR')
+RATELIMIT_RULES = {
+    'store:product_list': {
+        'rate': '120/m',
+        'burst': 60,
+        'param_cost': {'q': 2, 'min_price': 1, 'max_price': 1},
+    },
+    'store:add_to_cart': {'rate': '30/m', 'burst': 15},
+    'store:checkout': {'rate': '10/m', 'burst': 5, 'methods': ['POST']},
+}
+
+
+# ==============================
+# PROFILER
+# ==============================
+
+# Request profiler (store/profiler.py). When enabled, a sampled fraction of
+# requests, requests with a signed X-Profile header and staff who switch it
+# on at /staff/profiler/ are profiled to PROFILER_DIR. The project directory
+# is read-only on Vercel, so profiles go to /tmp there (per instance, and lost
+# when the instance is recycled).
+PROFILER_ENABLED = os.environ.get('PROFILER_ENABLED', 'False') == 'True'
+PROFILER_SAMPLE_RATE = float(os.environ.get('PROFILER_SAMPLE_RATE', 0.0))
+PROFILER_DIR = Path(os.environ.get(
+    'PROFILER_DIR', '/tmp/profiles' if os.environ.get('VERCEL') else BASE_DIR / 'profiles'
+))
+PROFILER_MAX_FILES = int(os.environ.get('PROFILER_MAX_FILES', 200))
+PROFILER_MAX_AGE_DAYS = int(os.environ.get('PROFILER_MAX_AGE_DAYS', 7))
+
+
 # ==============================
 # CLOUDINARY (MEDIA STORAGE)
 # ==============================
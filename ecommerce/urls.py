@@ -1,9 +1,28 @@
-from django.contrib import admin
 from django.urls import path, include
+from django.urls.resolvers import RoutePattern, URLResolver
 from django.conf import settings
 from django.conf.urls.static import static
 
+
+class LazyURLResolver(URLResolver):
+    """
+    Resolver whose urlconf is only imported once a URL under it is resolved
+    or reversed. include() imports eagerly, and the root resolver populates
+    every child on the first reverse(), so both are skipped until then.
+    """
+
+    def _populate(self):
+        if 'urlconf_module' in self.__dict__:
+            super()._populate()
+
+
+if settings.LEAN_STARTUP:
+    admin_urls = LazyURLResolver(RoutePattern('admin/'), 'ecommerce.admin_urls', app_name='admin', namespace='admin')
+else:
+    from django.contrib import admin
+    admin_urls = path('admin/', admin.site.urls)
+
 urlpatterns = [
-    path('admin/', admin.site.urls),
+    admin_urls,
     path('', include('store.urls')),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
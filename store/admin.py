@@ -1,5 +1,13 @@
+from datetime import timedelta
+
 from django.contrib import admin
-from .models import Category, Product, Order, OrderItem, Review, Wishlist
+from django.db.models import Sum
+
+from .analytics import local_date
+from .models import (
+    Category, Product, Order, OrderItem, Review, Wishlist,
+    DailySales, ProductSales, CategorySales, ArchivedOrder, ArchivedOrderItem,
+)
 
 
 @admin.register(Category)
@@ -16,7 +24,7 @@ class OrderItemInline(admin.TabularInline):
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ['name', 'category', 'price', 'stock', 'is_featured', 'is_new']
+    list_display = ['name', 'category', 'price', 'compare_price', 'discount_percent', 'stock', 'is_featured', 'is_new']
     list_filter = ['category', 'is_featured', 'is_new']
     list_editable = ['price', 'stock', 'is_featured', 'is_new']
     prepopulated_fields = {'slug': ('name',)}
@@ -31,5 +39,87 @@ class OrderAdmin(admin.ModelAdmin):
     inlines = [OrderItemInline]
 
 
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    extra = 0
+    can_delete = False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'status', 'total_price', 'created_at', 'archived_at']
+    list_filter = ['status']
+    inlines = [ArchivedOrderItemInline]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 admin.site.register(Review)
 admin.site.register(Wishlist)
+
+
+@admin.register(DailySales)
+class SalesDashboardAdmin(admin.ModelAdmin):
+    """Sales dashboard. Reads only the rollup tables, never Order/OrderItem."""
+    change_list_template = 'admin/store/dailysales/sales_dashboard.html'
+    list_display = ['date', 'orders', 'items', 'revenue']
+    date_hierarchy = 'date'
+    periods = [7, 30, 90, 365]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        try:
+            days = int(request.GET.get('days', 30))
+        except ValueError:
+            days = 30
+        if days not in self.periods:
+            days = 30
+        since = local_date() - timedelta(days=days - 1)
+
+        totals = DailySales.objects.filter(date__gte=since).aggregate(
+            orders=Sum('orders'), items=Sum('items'), revenue=Sum('revenue'),
+        )
+        top_products = (
+            ProductSales.objects.filter(date__gte=since)
+            .values('product_id', 'product__name')
+            .annotate(units=Sum('units'), revenue=Sum('revenue'))
+            .filter(units__gt=0)
+            .order_by('-revenue')[:10]
+        )
+        top_categories = (
+            CategorySales.objects.filter(date__gte=since)
+            .values('category_id', 'category__name')
+            .annotate(units=Sum('units'), revenue=Sum('revenue'))
+            .filter(units__gt=0)
+            .order_by('-revenue')[:10]
+        )
+        extra_context = {
+            **(extra_context or {}),
+            'days': days,
+            'periods': self.periods,
+            'totals': totals,
+            'top_products': top_products,
+            'top_categories': top_categories,
+        }
+        # The changelist's own date filters must not see the dashboard's param.
+        request.GET = request.GET.copy()
+        request.GET.pop('days', None)
+        return super().changelist_view(request, extra_context=extra_context)
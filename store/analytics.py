@@ -0,0 +1,147 @@
+"""
+Incremental sales rollups.
+
+Each order and order item contributes a fixed amount to the daily, product
+and category rollup rows for the day the order was placed. When something
+changes we subtract the old contribution and add the new one, so the
+rollups never need an aggregate over the order history. The
+rebuild_sales_rollups command recomputes them from scratch for drift repair
+(e.g. after QuerySet.update() calls, which bypass signals).
+"""
+import contextvars
+from collections import defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.utils import timezone
+
+from .models import (
+    ArchivedOrder, ArchivedOrderItem, CategorySales, DailySales, Order, OrderItem, ProductSales,
+)
+
+UNCOUNTED_STATUSES = ('cancelled',)
+
+_paused = contextvars.ContextVar('sales_rollups_paused', default=False)
+
+
+@contextmanager
+def paused():
+    """Ignore order/item deletes, e.g. while orders are moved to the archive."""
+    token = _paused.set(True)
+    try:
+        yield
+    finally:
+        _paused.reset(token)
+
+
+def is_paused():
+    return _paused.get()
+
+
+def local_date(value=None):
+    value = value or timezone.now()
+    if timezone.is_aware(value):
+        return timezone.localdate(value)
+    return value.date()
+
+
+def order_date(order):
+    return local_date(order.created_at)
+
+
+def is_counted(status):
+    return status not in UNCOUNTED_STATUSES
+
+
+def _bump(model, lookup, **deltas):
+    model.objects.get_or_create(**lookup)
+    model.objects.filter(**lookup).update(**{k: F(k) + v for k, v in deltas.items()})
+
+
+def apply_order(date, total, sign=1):
+    _bump(DailySales, {'date': date}, orders=sign, revenue=sign * total)
+
+
+def apply_item(date, product_id, category_id, quantity, price, sign=1):
+    revenue = sign * quantity * price
+    _bump(DailySales, {'date': date}, items=sign * quantity)
+    _bump(ProductSales, {'date': date, 'product_id': product_id}, units=sign * quantity, revenue=revenue)
+    _bump(CategorySales, {'date': date, 'category_id': category_id}, units=sign * quantity, revenue=revenue)
+
+
+def item_rows(order_id):
+    return OrderItem.objects.filter(order_id=order_id).values_list(
+        'product_id', 'product__category_id', 'quantity', 'price',
+    )
+
+
+def apply_order_items(order, sign=1):
+    date = order_date(order)
+    for product_id, category_id, quantity, price in item_rows(order.pk):
+        apply_item(date, product_id, category_id, quantity, price, sign)
+
+
+# ── Full rebuild ──────────────────────────────────────────────────────────────
+
+def rebuild(start=None, end=None):
+    """Recompute rollups for orders placed between start and end (inclusive dates).
+
+    Reads both the live and the archived order tables.
+    """
+    rollups = [DailySales.objects.all(), ProductSales.objects.all(), CategorySales.objects.all()]
+    if start:
+        rollups = [qs.filter(date__gte=start) for qs in rollups]
+    if end:
+        rollups = [qs.filter(date__lte=end) for qs in rollups]
+    for qs in rollups:
+        qs.delete()
+
+    daily = defaultdict(lambda: {'orders': 0, 'items': 0, 'revenue': Decimal(0)})
+    products = defaultdict(lambda: {'units': 0, 'revenue': Decimal(0)})
+    categories = defaultdict(lambda: {'units': 0, 'revenue': Decimal(0)})
+    line_total = ExpressionWrapper(F('quantity') * F('price'), output_field=DecimalField())
+    for order_model, item_model in [(Order, OrderItem), (ArchivedOrder, ArchivedOrderItem)]:
+        orders = order_model.objects.exclude(status__in=UNCOUNTED_STATUSES)
+        items = item_model.objects.exclude(order__status__in=UNCOUNTED_STATUSES)
+        if start:
+            orders = orders.filter(created_at__date__gte=start)
+            items = items.filter(order__created_at__date__gte=start)
+        if end:
+            orders = orders.filter(created_at__date__lte=end)
+            items = items.filter(order__created_at__date__lte=end)
+
+        for r in orders.values(day=F('created_at__date')).annotate(n=Count('id'), revenue=Sum('total_price')):
+            daily[r['day']]['orders'] += r['n']
+            daily[r['day']]['revenue'] += r['revenue']
+        items = items.values(day=F('order__created_at__date'))
+        for r in items.annotate(units=Sum('quantity')):
+            daily[r['day']]['items'] += r['units']
+        for r in items.values('day', 'product_id').annotate(units=Sum('quantity'), revenue=Sum(line_total)):
+            products[r['day'], r['product_id']]['units'] += r['units']
+            products[r['day'], r['product_id']]['revenue'] += r['revenue']
+        by_category = items.values('day', category_id=F('product__category_id'))
+        for r in by_category.annotate(units=Sum('quantity'), revenue=Sum(line_total)):
+            categories[r['day'], r['category_id']]['units'] += r['units']
+            categories[r['day'], r['category_id']]['revenue'] += r['revenue']
+
+    DailySales.objects.bulk_create(DailySales(date=day, **v) for day, v in daily.items())
+    ProductSales.objects.bulk_create(
+        ProductSales(date=day, product_id=pid, **v) for (day, pid), v in products.items()
+    )
+    CategorySales.objects.bulk_create(
+        CategorySales(date=day, category_id=cid, **v) for (day, cid), v in categories.items()
+    )
+    return len(daily)
+
+
+def compact(end=None):
+    """Drop rollup rows up to end that net out to nothing (e.g. after cancellations)."""
+    empty = [
+        DailySales.objects.filter(orders=0, items=0, revenue=0),
+        ProductSales.objects.filter(units=0, revenue=0),
+        CategorySales.objects.filter(units=0, revenue=0),
+    ]
+    if end:
+        empty = [qs.filter(date__lte=end) for qs in empty]
+    return sum(qs.delete()[0] for qs in empty)
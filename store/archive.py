@@ -0,0 +1,63 @@
+"""
+Hot/cold order archiving.
+
+Finished orders (ORDER_ARCHIVE_STATUSES) placed more than
+ORDER_ARCHIVE_AFTER_DAYS ago are copied, with their items and original ids,
+into ArchivedOrder/ArchivedOrderItem and deleted from the live tables, one
+batch per transaction. Sales rollups already include these orders and are
+left untouched.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import analytics
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+
+def archive_cutoff(days=None):
+    if days is None:
+        days = getattr(settings, 'ORDER_ARCHIVE_AFTER_DAYS', 180)
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable_orders(cutoff):
+    statuses = getattr(settings, 'ORDER_ARCHIVE_STATUSES', ['delivered', 'cancelled'])
+    return Order.objects.filter(status__in=statuses, created_at__lt=cutoff)
+
+
+def _copy_fields(model):
+    return [f.attname for f in model._meta.concrete_fields]
+
+
+def archive_batch(cutoff, batch_size=500):
+    """Move one batch of archivable orders; returns how many were moved."""
+    with transaction.atomic(), analytics.paused():
+        ids = list(
+            archivable_orders(cutoff).select_for_update()
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+        ArchivedOrder.objects.bulk_create(
+            ArchivedOrder(**row) for row in Order.objects.filter(id__in=ids).values(*_copy_fields(Order))
+        )
+        ArchivedOrderItem.objects.bulk_create(
+            ArchivedOrderItem(**row)
+            for row in OrderItem.objects.filter(order_id__in=ids).values(*_copy_fields(OrderItem))
+        )
+        Order.objects.filter(id__in=ids).delete()
+    return len(ids)
+
+
+def archive_orders(cutoff, batch_size=500, max_batches=None):
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        count = archive_batch(cutoff, batch_size)
+        if not count:
+            break
+        moved += count
+        batches += 1
+    return moved
@@ -0,0 +1,133 @@
+"""
+Full-page cache for anonymous catalog traffic.
+
+Pages are only cached (and served from cache) for anonymous visitors with an
+empty cart and no pending flash messages, so the rendered HTML is identical
+for everyone apart from the CSRF token, which is swapped in on every hit.
+
+Each entry is tagged with surrogate keys (``product:<id>``, ``category:<slug>``,
+``catalog``, ``categories``). Purging a key records the time of the purge; an
+entry whose render started before the latest purge of any of its keys is
+treated as a miss, so a purge that lands while a page is rendering is never
+hidden behind the stale result. Timestamps come from ``time.time()``, so
+workers sharing a cache need reasonably synchronised clocks. See
+``store/signals.py`` for the model hooks that purge keys.
+"""
+import math
+import re
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+
+CACHEABLE_METHODS = ('GET', 'HEAD')
+CSRF_INPUT_RE = re.compile(rb'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+
+def get_cache():
+    return caches[getattr(settings, 'PAGE_CACHE_ALIAS', 'default')]
+
+
+def page_key(request):
+    return f'page:{request.build_absolute_uri()}'
+
+
+def tag_key(tag):
+    return f'page:tag:{tag}'
+
+
+def product_key(product_id):
+    return f'product:{product_id}'
+
+
+def category_key(slug):
+    return f'category:{slug}'
+
+
+def set_surrogate_keys(response, keys):
+    keys = sorted(set(keys))
+    response.surrogate_keys = keys
+    response['Surrogate-Key'] = ' '.join(keys)
+    return response
+
+
+def purge(*tags):
+    if tags:
+        get_cache().set_many({tag_key(t): time.time() for t in tags}, None)
+
+
+def is_cacheable_request(request):
+    if not getattr(settings, 'PAGE_CACHE_ENABLED', True):
+        return False
+    if request.method not in CACHEABLE_METHODS:
+        return False
+    if request.user.is_authenticated:
+        return False
+    if request.session.get('cart'):
+        return False
+    return len(get_messages(request)) == 0
+
+
+def _is_stale(cache, tags, rendered_at):
+    # A tag missing from the cache may have been evicted after a purge, so it
+    # counts as purged just now.
+    keys = [tag_key(t) for t in tags]
+    purged = cache.get_many(keys)
+    return any(purged.get(k, math.inf) > rendered_at for k in keys)
+
+
+def _lookup(cache, request):
+    entry = cache.get(page_key(request))
+    if entry is None or _is_stale(cache, entry['tags'], entry['rendered_at']):
+        return None
+    return entry
+
+
+def _store(cache, request, response, rendered_at):
+    tags = getattr(response, 'surrogate_keys', None)
+    if response.status_code != 200 or response.streaming or not tags or response.cookies:
+        return
+    # Tags never purged (or evicted) start out as purged when this render
+    # began: older entries carrying them become stale, this one stays valid.
+    # add() so a concurrent purge is never overwritten.
+    for tag in tags:
+        cache.add(tag_key(tag), rendered_at, None)
+    if _is_stale(cache, tags, rendered_at):
+        return
+    cache.set(page_key(request), {
+        'content': response.content,
+        'content_type': response['Content-Type'],
+        'surrogate_key': response['Surrogate-Key'],
+        'tags': tags,
+        'rendered_at': rendered_at,
+    }, getattr(settings, 'PAGE_CACHE_TIMEOUT', 600))
+
+
+def _replay(request, entry):
+    token = get_token(request).encode()
+    content = CSRF_INPUT_RE.sub(lambda m: m.group(1) + token + m.group(2), entry['content'])
+    response = HttpResponse(content, content_type=entry['content_type'])
+    response['Surrogate-Key'] = entry['surrogate_key']
+    response['X-Page-Cache'] = 'HIT'
+    return response
+
+
+def cache_anonymous_page(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not is_cacheable_request(request):
+            return view(request, *args, **kwargs)
+        cache = get_cache()
+        entry = _lookup(cache, request)
+        if entry is not None:
+            return _replay(request, entry)
+        rendered_at = time.time()
+        response = view(request, *args, **kwargs)
+        _store(cache, request, response, rendered_at)
+        response['X-Page-Cache'] = 'MISS'
+        return response
+    return wrapper
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from store.archive import archivable_orders, archive_cutoff, archive_orders
+
+
+class Command(BaseCommand):
+    help = 'Move old delivered/cancelled orders into the archive tables, in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Archive orders older than this (default: ORDER_ARCHIVE_AFTER_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--max-batches', type=int, help='Stop after this many batches')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many orders would move')
+
+    def handle(self, *args, **options):
+        cutoff = archive_cutoff(options['days'])
+        if options['dry_run']:
+            count = archivable_orders(cutoff).count()
+            self.stdout.write(f'{count} order(s) placed before {cutoff:%Y-%m-%d} would be archived.')
+            return
+        moved = archive_orders(cutoff, options['batch_size'], options['max_batches'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {moved} order(s) placed before {cutoff:%Y-%m-%d}.'
+        ))
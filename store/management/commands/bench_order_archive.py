@@ -0,0 +1,89 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from store.archive import archive_orders
+from store.models import Category, Order, OrderItem, Product
+from store.views import user_orders
+
+
+def timed(fn, reps):
+    samples = []
+    for _ in range(reps):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+class Command(BaseCommand):
+    help = ('Benchmark hot-table order queries before and after archiving. '
+            'Runs inside a transaction that is rolled back, so no data is kept.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=50000)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--days', type=int, default=730, help='Spread orders over this many days')
+        parser.add_argument('--archive-after', type=int, default=180)
+        parser.add_argument('--reps', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def run(self, options):
+        n, days, reps = options['orders'], options['days'], options['reps']
+        self.stdout.write(f'Seeding {n} orders over {days} days...')
+        category = Category.objects.create(name='Bench', slug='bench-archive')
+        product = Product.objects.create(
+            category=category, name='Bench', slug='bench-archive', description='', price=10, stock=0,
+        )
+        users = User.objects.bulk_create(User(username=f'bench-archive-{i}') for i in range(options['users']))
+        user = users[0]
+        # Oldest first, so ids and created_at grow together like real traffic.
+        ages = [days - 1 - i * days // n for i in range(n)]
+        finished = ['delivered'] * 9 + ['cancelled']
+        orders = Order.objects.bulk_create(
+            Order(user=users[i % len(users)], total_price=10, shipping_name='x', shipping_address='x',
+                  shipping_city='x', shipping_zip='x', status=finished[i % 10] if ages[i] > 30 else 'pending')
+            for i in range(n)
+        )
+        if not orders[0].pk:
+            orders = list(Order.objects.filter(user__in=users).order_by('id'))
+        OrderItem.objects.bulk_create(OrderItem(order=o, product=product, quantity=1, price=10) for o in orders)
+        now = timezone.now()
+        by_age = {}
+        for order, age in zip(orders, ages):
+            by_age.setdefault(age, []).append(order.pk)
+        for age, ids in by_age.items():
+            Order.objects.filter(id__range=(ids[0], ids[-1])).update(created_at=now - timedelta(days=age))
+
+        queries = [
+            ('order_list (hot table)', lambda: list(
+                Order.objects.filter(user=user).order_by('-created_at')[:20])),
+            ('profile (hot, archive fallback)', lambda: user_orders(user, limit=5)),
+            ('admin changelist count', lambda: Order.objects.count()),
+            ('admin changelist page', lambda: list(Order.objects.order_by('-id')[:100])),
+            ('pending orders count', lambda: Order.objects.filter(status='pending').count()),
+        ]
+        before = [timed(fn, reps) for _, fn in queries]
+        hot_before = Order.objects.count()
+
+        start = time.perf_counter()
+        moved = archive_orders(now - timedelta(days=options['archive_after']))
+        elapsed = time.perf_counter() - start
+        after = [timed(fn, reps) for _, fn in queries]
+        self.stdout.write(
+            f'Archived {moved} orders in {elapsed:.1f}s; hot table {hot_before} -> {Order.objects.count()} rows\n'
+        )
+
+        self.stdout.write(f'{"query":<34}{"before ms":>10}{"after ms":>10}')
+        for (label, _), b, a in zip(queries, before, after):
+            self.stdout.write(f'{label:<34}{b:>10.2f}{a:>10.2f}')
+        self.stdout.write('\nRolled back; no benchmark data was kept.')
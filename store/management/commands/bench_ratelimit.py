@@ -0,0 +1,43 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.urls import resolve
+
+from store.ratelimit import CacheBackend, MemoryBackend, RateLimitMiddleware, Rule
+
+
+class Command(BaseCommand):
+    help = 'Microbenchmark the per-request cost of the rate limiter'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=100000)
+        parser.add_argument('--clients', type=int, default=1000, help='Distinct client IPs to rotate through')
+
+    def handle(self, *args, **options):
+        n, clients = options['iterations'], options['clients']
+        factory = RequestFactory()
+        requests = []
+        for i in range(clients):
+            request = factory.get('/products/', {'q': 'coat'}, REMOTE_ADDR=f'10.0.{i // 256}.{i % 256}')
+            request.user = AnonymousUser()
+            request.resolver_match = resolve('/products/')
+            requests.append(request)
+
+        middleware = RateLimitMiddleware(lambda request: None)
+        rule = Rule('store:product_list', '1000000/s', param_cost={'q': 2})
+        cases = [
+            ('unlimited URL', {}, MemoryBackend()),
+            ('memory backend', {rule.name: rule}, MemoryBackend()),
+            ('cache backend', {rule.name: rule}, CacheBackend()),
+        ]
+        self.stdout.write(f'{n} requests across {clients} clients\n')
+        for label, rules, backend in cases:
+            middleware.rules, middleware.backend = rules, backend
+            start = time.perf_counter()
+            for i in range(n):
+                if middleware.process_view(requests[i % clients], None, (), {}) is not None:
+                    raise AssertionError('benchmark request was throttled')
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f'{label:<16}{elapsed / n * 1e6:>8.2f} µs/request')
@@ -0,0 +1,121 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ecommerce.db.sqlite3.base import apply_pragmas
+
+PRODUCTS = 500
+SESSIONS = 2000
+
+
+def setup_db(path):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.executescript('''
+        CREATE TABLE product (id INTEGER PRIMARY KEY, name TEXT, price REAL, stock INTEGER);
+        CREATE TABLE session (key TEXT PRIMARY KEY, data TEXT, expire REAL);
+        CREATE INDEX product_stock ON product (stock);
+    ''')
+    conn.executemany(
+        'INSERT INTO product VALUES (?, ?, ?, ?)',
+        [(i, f'Product {i}', 10 + i % 90, 50) for i in range(PRODUCTS)],
+    )
+    conn.executemany(
+        'INSERT INTO session VALUES (?, ?, ?)',
+        [(f's{i}', '{}', 0) for i in range(SESSIONS)],
+    )
+    conn.close()
+
+
+def worker(path, pragmas, begin, duration, write_ratio, seed, results):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path, isolation_level=None, timeout=5.0)
+    apply_pragmas(conn, pragmas)
+    reads, writes, locked, latencies = 0, 0, 0, []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            if rng.random() < write_ratio:
+                # Cart/session style write: read the row, then update it.
+                key = f's{rng.randrange(SESSIONS)}'
+                conn.execute(begin)
+                conn.execute('SELECT data FROM session WHERE key = ?', (key,)).fetchone()
+                conn.execute('UPDATE session SET data = ?, expire = ? WHERE key = ?',
+                             (f'{{"cart": {rng.randrange(100)}}}', time.time(), key))
+                conn.execute('COMMIT')
+                writes += 1
+            else:
+                offset = rng.randrange(PRODUCTS - 20)
+                conn.execute('SELECT id, name, price FROM product WHERE stock > 0 '
+                             'ORDER BY price LIMIT 20 OFFSET ?', (offset,)).fetchall()
+                reads += 1
+        except sqlite3.OperationalError:
+            locked += 1
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+    results.put((reads, writes, locked, latencies))
+
+
+class Command(BaseCommand):
+    help = 'Benchmark SQLite read/write concurrency with default vs. configured pragmas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds per profile')
+        parser.add_argument('--write-ratio', type=float, default=0.2)
+
+    def handle(self, *args, **options):
+        tuned = getattr(settings, 'SQLITE_PRAGMAS', None) or {
+            'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 5000,
+        }
+        profiles = [
+            ('default', {}, 'BEGIN'),
+            ('tuned', tuned, 'BEGIN'),
+            ('tuned+immediate', tuned, 'BEGIN IMMEDIATE'),
+        ]
+        self.stdout.write(
+            f'{options["workers"]} workers, {options["duration"]}s each, '
+            f'write ratio {options["write_ratio"]}\n'
+        )
+        self.stdout.write(f'{"profile":<18}{"reads/s":>10}{"writes/s":>10}{"locked":>8}{"p50 ms":>9}{"p99 ms":>9}')
+        for name, pragmas, begin in profiles:
+            reads, writes, locked, latencies = self.run_profile(pragmas, begin, options)
+            duration = options['duration']
+            p50 = statistics.median(latencies) * 1000 if latencies else 0
+            p99 = statistics.quantiles(latencies, n=100)[98] * 1000 if len(latencies) > 1 else 0
+            self.stdout.write(
+                f'{name:<18}{reads / duration:>10.0f}{writes / duration:>10.0f}'
+                f'{locked:>8}{p50:>9.2f}{p99:>9.2f}'
+            )
+
+    def run_profile(self, pragmas, begin, options):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.sqlite3')
+            setup_db(path)
+            results = multiprocessing.Queue()
+            procs = [
+                multiprocessing.Process(target=worker, args=(
+                    path, pragmas, begin, options['duration'], options['write_ratio'], i, results,
+                ))
+                for i in range(options['workers'])
+            ]
+            for p in procs:
+                p.start()
+            collected = [results.get() for _ in procs]
+            for p in procs:
+                p.join()
+        reads = sum(r[0] for r in collected)
+        writes = sum(r[1] for r in collected)
+        locked = sum(r[2] for r in collected)
+        latencies = [lat for r in collected for lat in r[3]]
+        return reads, writes, locked, latencies
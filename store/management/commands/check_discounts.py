@@ -0,0 +1,73 @@
+import random
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
+
+from store.models import Category, Product, compute_discount
+
+
+class Command(BaseCommand):
+    help = ('Check that Product.discount_percent is the same whichever way it was written: '
+            'sweep price pairs through update() and save() (rolled back), then compare the '
+            'stored column of existing products against save()')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pairs', type=int, default=2000, help='Price pairs to sweep')
+        parser.add_argument('--fix', action='store_true', help='Rewrite stored values that disagree')
+
+    def handle(self, *args, **options):
+        mismatches = self.sweep(options['pairs'])
+        for path, price, compare_price, sql, python in mismatches[:10]:
+            self.stdout.write(f'  {price} vs {compare_price}: update({path}) {sql}%, save() {python}%')
+        if mismatches:
+            raise CommandError(f'{len(mismatches)} update() results disagree with save()')
+        self.stdout.write(f'update() and save() agree on {options["pairs"]} price pairs.')
+
+        drifted = [
+            p for p in Product.objects.only('price', 'compare_price', 'discount_percent')
+            if p.discount_percent != compute_discount(p.price, p.compare_price)
+        ]
+        if drifted and options['fix']:
+            Product.objects.bulk_update(drifted, ['price'])
+        self.stdout.write(f'{len(drifted)} stored product discount(s) out of date'
+                          f'{", fixed" if drifted and options["fix"] else ""}.')
+
+    def sweep(self, n):
+        # Half random pairs, half exact whole-number discounts (e.g. 211.58 vs
+        # 298 is exactly 29%), where floating-point rounding shows up.
+        rng = random.Random(0)
+        pairs = []
+        for i in range(n):
+            if i % 2:
+                compare_cents = rng.randint(1, 1000) * 100
+                price_cents = compare_cents * rng.randint(1, 99) // 100
+            else:
+                compare_cents = rng.randint(1, 100000)
+                price_cents = rng.randint(0, compare_cents + 500)
+            pairs.append((Decimal(price_cents) / 100, Decimal(compare_cents) / 100))
+
+        with transaction.atomic():
+            category = Category.objects.create(name='Discount check', slug='discount-check')
+            products = Product.objects.bulk_create(
+                Product(category=category, name=f'Check {i}', slug=f'discount-check-{i}', description='',
+                        price=price, compare_price=compare_price)
+                for i, (price, compare_price) in enumerate(pairs)
+            )
+            checked = Product.objects.filter(category=category)
+            # update() with column references, then with literal values.
+            checked.update(price=F('price'), compare_price=F('compare_price'))
+            stored = {'F': dict(checked.values_list('slug', 'discount_percent'))}
+            for p in products:
+                Product.objects.filter(pk=p.pk).update(price=p.price, compare_price=p.compare_price)
+            stored['values'] = dict(checked.values_list('slug', 'discount_percent'))
+            transaction.set_rollback(True)
+
+        mismatches = []
+        for p in products:
+            expected = compute_discount(p.price, p.compare_price)
+            for path, values in stored.items():
+                if values[p.slug] != expected:
+                    mismatches.append((path, p.price, p.compare_price, values[p.slug], expected))
+        return mismatches
@@ -0,0 +1,124 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Runs in a fresh interpreter so the measurement covers a real cold start:
+# importing the WSGI app (settings, app registry, middleware) and serving
+# one request through it. The environ is a plain dict so nothing outside the
+# app (e.g. django.test) is imported or counted.
+BOOT_SCRIPT = '''
+import io, json, os, sys, time
+start = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce.settings')
+from ecommerce.wsgi import application
+booted = time.perf_counter()
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': sys.argv[1], 'SCRIPT_NAME': '', 'QUERY_STRING': '',
+    'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'HTTP_HOST': 'localhost',
+    'REMOTE_ADDR': '127.0.0.1', 'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http',
+    'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+    'wsgi.multithread': False, 'wsgi.multiprocess': True, 'wsgi.run_once': False,
+}
+status = []
+body = application(environ, lambda s, h, exc_info=None: status.append(s))
+b''.join(body)
+done = time.perf_counter()
+print(json.dumps({'boot': booted - start, 'first_response': done - start, 'status': status[0],
+                  'modules': len(sys.modules)}))
+'''
+
+
+def parse_importtime(stderr):
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+class Command(BaseCommand):
+    help = 'Measure cold-start cost: per-module import time and time to first response'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/', help='Path to request once booted (default: /)')
+        parser.add_argument('--top', type=int, default=15, help='Number of modules/packages to list')
+        parser.add_argument('--runs', type=int, default=7, help='Timed cold starts per mode; the median is reported')
+        parser.add_argument('--mode', choices=['current', 'full', 'lean', 'compare'], default='compare',
+                            help='Startup mode(s) to measure (default: compare full and lean)')
+
+    def handle(self, *args, **options):
+        if options['mode'] == 'compare':
+            modes = ['full', 'lean']
+        else:
+            modes = [options['mode']]
+
+        # Timed runs go without -X importtime, whose per-module reporting
+        # inflates import cost, and alternate between modes so machine load
+        # drifts over both alike. One extra importtime run per mode gives the
+        # module breakdown.
+        timings = {mode: [] for mode in modes}
+        for _ in range(options['runs']):
+            for mode in modes:
+                timings[mode].append(self.cold_start(mode, options['path']))
+
+        results = {}
+        for mode in modes:
+            runs = sorted(timings[mode], key=lambda r: r['first_response'])
+            results[mode] = runs[len(runs) // 2]
+            imports = self.cold_start(mode, options['path'], importtime=True)['imports']
+            self.report(mode, results[mode], runs, imports, options['top'])
+
+        if len(results) == 2:
+            full, lean = results['full'], results['lean']
+            saved = full['first_response'] - lean['first_response']
+            self.stdout.write(self.style.SUCCESS(
+                f'\nLean startup saves {saved * 1000:.0f} ms to first response (median of {options["runs"]}, '
+                f'{saved / full["first_response"]:.0%}), '
+                f'{full["modules"] - lean["modules"]} fewer modules loaded.'
+            ))
+
+    def cold_start(self, mode, path, importtime=False):
+        env = dict(os.environ)
+        if mode != 'current':
+            env['LEAN_STARTUP'] = 'True' if mode == 'lean' else 'False'
+        flags = ['-X', 'importtime'] if importtime else []
+        proc = subprocess.run(
+            [sys.executable, *flags, '-c', BOOT_SCRIPT, path],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            self.stderr.write(proc.stderr[-2000:])
+            raise SystemExit(proc.returncode)
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        result['imports'] = parse_importtime(proc.stderr) if importtime else []
+        return result
+
+    def report(self, mode, result, runs, imports, top):
+        by_package = defaultdict(int)
+        for name, self_us, _ in imports:
+            by_package[name.split('.')[0]] += self_us
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n{mode} startup'))
+        self.stdout.write(
+            f'  boot {result["boot"] * 1000:.0f} ms, first response {result["first_response"] * 1000:.0f} ms '
+            f'(range {runs[0]["first_response"] * 1000:.0f}-{runs[-1]["first_response"] * 1000:.0f} ms, '
+            f'{result["status"]}), {result["modules"]} modules loaded'
+        )
+        if not result['status'].startswith(('2', '3')):
+            self.stdout.write(self.style.WARNING(
+                '  The request failed, so these timings include error handling; '
+                'check the path and that migrations are applied.'
+            ))
+        self.stdout.write(f'\n  {"package":<40}{"self ms":>10}')
+        for package, us in sorted(by_package.items(), key=lambda i: -i[1])[:top]:
+            self.stdout.write(f'  {package:<40}{us / 1000:>10.1f}')
+        self.stdout.write(f'\n  {"module":<40}{"cumulative ms":>14}')
+        for name, _, cumulative in sorted(imports, key=lambda i: -i[2])[:top]:
+            self.stdout.write(f'  {name:<40}{cumulative / 1000:>14.1f}')
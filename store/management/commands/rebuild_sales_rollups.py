@@ -0,0 +1,40 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from store import analytics
+
+
+class Command(BaseCommand):
+    help = 'Backfill and compact the sales rollup tables (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=2,
+                            help='Rebuild the N days before today (default: 2)')
+        parser.add_argument('--since', type=date.fromisoformat, help='Rebuild from this date (YYYY-MM-DD)')
+        parser.add_argument('--all', action='store_true', help='Rebuild the full order history')
+        parser.add_argument('--include-today', action='store_true',
+                            help="Also rebuild today's rows; only safe while no orders are being placed")
+
+    def handle(self, *args, **options):
+        today = analytics.local_date()
+        # Today's rows are still being bumped by live checkouts; rebuilding
+        # them deletes and recreates rows those increments are aimed at.
+        end = None if options['include_today'] else today - timedelta(days=1)
+        if options['all']:
+            start = None
+        elif options['since']:
+            start = options['since']
+        else:
+            start = today - timedelta(days=options['days'])
+
+        with transaction.atomic():
+            days = analytics.rebuild(start=start, end=end)
+            removed = analytics.compact(end=end)
+
+        since = f'since {start}' if start else 'for all history'
+        until = f' until {end}' if end else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt rollups {since}{until}: {days} day(s) with sales, {removed} empty row(s) compacted.'
+        ))
@@ -0,0 +1,90 @@
+# Generated by Django 4.2.28 on 2026-10-19 11:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+
+
+def backfill_sales_rollups(apps, schema_editor):
+    # Same totals as store.analytics.rebuild(), for the orders placed before
+    # the rollups existed.
+    Order = apps.get_model('store', 'Order')
+    OrderItem = apps.get_model('store', 'OrderItem')
+    DailySales = apps.get_model('store', 'DailySales')
+    ProductSales = apps.get_model('store', 'ProductSales')
+    CategorySales = apps.get_model('store', 'CategorySales')
+
+    orders = Order.objects.exclude(status='cancelled').values(day=F('created_at__date'))
+    daily = {
+        r['day']: DailySales(date=r['day'], orders=r['n'], revenue=r['revenue'])
+        for r in orders.annotate(n=Count('id'), revenue=Sum('total_price'))
+    }
+    items = OrderItem.objects.exclude(order__status='cancelled').values(day=F('order__created_at__date'))
+    for r in items.annotate(units=Sum('quantity')):
+        daily[r['day']].items = r['units']
+    DailySales.objects.bulk_create(daily.values())
+
+    line_total = ExpressionWrapper(F('quantity') * F('price'), output_field=DecimalField())
+    ProductSales.objects.bulk_create(
+        ProductSales(date=r['day'], product_id=r['product_id'], units=r['units'], revenue=r['revenue'])
+        for r in items.values('day', 'product_id').annotate(units=Sum('quantity'), revenue=Sum(line_total))
+    )
+    CategorySales.objects.bulk_create(
+        CategorySales(date=r['day'], category_id=r['category_id'], units=r['units'], revenue=r['revenue'])
+        for r in items.values('day', category_id=F('product__category_id')).annotate(
+            units=Sum('quantity'), revenue=Sum(line_total),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('orders', models.IntegerField(default=0)),
+                ('items', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name_plural': 'Daily sales',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('product', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='store.product')),
+            ],
+            options={
+                'verbose_name_plural': 'Product sales',
+                'unique_together': {('date', 'product')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CategorySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('category', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='store.category')),
+            ],
+            options={
+                'verbose_name_plural': 'Category sales',
+                'unique_together': {('date', 'category')},
+            },
+        ),
+        migrations.RunPython(backfill_sales_rollups, migrations.RunPython.noop),
+    ]
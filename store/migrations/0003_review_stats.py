@@ -0,0 +1,52 @@
+# Generated by Django 4.2.28 on 2026-10-19 11:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+
+
+def backfill_review_stats(apps, schema_editor):
+    Review = apps.get_model('store', 'Review')
+    ReviewStats = apps.get_model('store', 'ReviewStats')
+    stats = {}
+    for row in Review.objects.values('product_id', 'rating').annotate(n=Count('id')):
+        s = stats.setdefault(row['product_id'], ReviewStats(product_id=row['product_id']))
+        setattr(s, f'stars_{row["rating"]}', row['n'])
+    ReviewStats.objects.bulk_create(stats.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0002_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewStats',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='review_stats', serialize=False, to='store.product')),
+                ('stars_1', models.PositiveIntegerField(default=0)),
+                ('stars_2', models.PositiveIntegerField(default=0)),
+                ('stars_3', models.PositiveIntegerField(default=0)),
+                ('stars_4', models.PositiveIntegerField(default=0)),
+                ('stars_5', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Review stats',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['product', '-created_at', '-id'], name='review_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['product', '-rating', '-created_at', '-id'], name='review_highest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['product', 'rating', '-created_at', '-id'], name='review_lowest_idx'),
+        ),
+        migrations.RunPython(backfill_review_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.28 on 2026-10-19 11:48
+
+from django.db import migrations, models
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Cast, Round
+
+
+def backfill_discount_percent(apps, schema_editor):
+    # Integer cents, matching store.models.discount_expression().
+    Product = apps.get_model('store', 'Product')
+    price = Cast(Round(F('price') * 100), IntegerField())
+    compare_price = Cast(Round(F('compare_price') * 100), IntegerField())
+    Product.objects.update(discount_percent=Case(
+        When(compare_price__gt=F('price'), then=(compare_price - price) * 100 / compare_price),
+        default=Value(0),
+        output_field=IntegerField(),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_order_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='discount_percent',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_discount_percent, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,9 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Cast, Round
+from django.db.models.lookups import GreaterThan
 from django.contrib.auth.models import User
 from django.urls import reverse
 
@@ -19,6 +24,79 @@ class Category(models.Model):
         return reverse('store:category', kwargs={'slug': self.slug})
 
 
+# ── Stored discount ───────────────────────────────────────────────────────────
+# Product.discount_percent is a column so the Sale listing can filter and sort
+# on it in SQL. compute_discount() and discount_expression() are the Python
+# and SQL forms of the same formula; ProductQuerySet keeps the column in step
+# for bulk_create(), bulk_update() and update(), Product.save() for the rest.
+# Both work in integer cents: SQLite stores decimals as floats, and flooring a
+# float percentage disagrees with Decimal arithmetic (e.g. 211.58 vs 298).
+
+DISCOUNT_SOURCE_FIELDS = {'price', 'compare_price'}
+
+
+def _cents(value):
+    return int((Decimal(str(value)) * 100).to_integral_value())
+
+
+def compute_discount(price, compare_price):
+    if price is None or not compare_price:
+        return 0
+    price, compare_price = _cents(price), _cents(compare_price)
+    if compare_price > price:
+        return (compare_price - price) * 100 // compare_price
+    return 0
+
+
+def _cents_expression(value):
+    if not hasattr(value, 'resolve_expression'):
+        value = Value(value, output_field=models.DecimalField())
+    return Cast(Round(value * 100), IntegerField())
+
+
+def discount_expression(**values):
+    price = _cents_expression(values.get('price', F('price')))
+    compare_price = _cents_expression(values.get('compare_price', F('compare_price')))
+    return Case(
+        When(
+            GreaterThan(compare_price, price),
+            then=(compare_price - price) * 100 / compare_price,
+        ),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+class ProductQuerySet(models.QuerySet):
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.discount_percent = compute_discount(obj.price, obj.compare_price)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        fields = list(fields)
+        if DISCOUNT_SOURCE_FIELDS & set(fields):
+            objs = list(objs)
+            for obj in objs:
+                obj.discount_percent = compute_discount(obj.price, obj.compare_price)
+            if 'discount_percent' not in fields:
+                fields.append('discount_percent')
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+    def update(self, **kwargs):
+        if DISCOUNT_SOURCE_FIELDS & set(kwargs):
+            sources = {k: v for k, v in kwargs.items() if k in DISCOUNT_SOURCE_FIELDS}
+            kwargs['discount_percent'] = discount_expression(**sources)
+        return super().update(**kwargs)
+
+    update.alters_data = True
+
+    def on_sale(self):
+        return self.filter(discount_percent__gt=0)
+
+
 class Product(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='products')
     name = models.CharField(max_length=200)
@@ -31,30 +109,42 @@ class Product(models.Model):
     stock = models.PositiveIntegerField(default=0)
     is_featured = models.BooleanField(default=False)
     is_new = models.BooleanField(default=False)
+    discount_percent = models.PositiveSmallIntegerField(default=0, editable=False, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
     def get_absolute_url(self):
         return reverse('store:product_detail', kwargs={'slug': self.slug})
 
-    @property
-    def discount_percent(self):
-        if self.compare_price and self.compare_price > self.price:
-            return int((1 - self.price / self.compare_price) * 100)
-        return None
+    def save(self, *args, **kwargs):
+        self.discount_percent = compute_discount(self.price, self.compare_price)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and DISCOUNT_SOURCE_FIELDS & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'discount_percent'}
+        super().save(*args, **kwargs)
 
     @property
     def in_stock(self):
         return self.stock > 0
 
+    @property
+    def rating_stats(self):
+        try:
+            return self.review_stats
+        except ReviewStats.DoesNotExist:
+            return ReviewStats(product=self)
+
     def average_rating(self):
-        reviews = self.reviews.all()
-        if reviews:
-            return round(sum(r.rating for r in reviews) / len(reviews), 1)
-        return 0
+        return self.rating_stats.average
+
+    @property
+    def review_count(self):
+        return self.rating_stats.total
 
 
 class Review(models.Model):
@@ -66,11 +156,56 @@ class Review(models.Model):
 
     class Meta:
         unique_together = ('product', 'user')
+        # One index per review sort order (see REVIEW_SORTS in views.py), so
+        # each keyset page is a bounded index range scan.
+        indexes = [
+            models.Index(fields=['product', '-created_at', '-id'], name='review_recent_idx'),
+            models.Index(fields=['product', '-rating', '-created_at', '-id'], name='review_highest_idx'),
+            models.Index(fields=['product', 'rating', '-created_at', '-id'], name='review_lowest_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user.username} - {self.product.name}'
 
 
+class ReviewStats(models.Model):
+    """Per-product star histogram, kept in step with Review by store/signals.py."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='review_stats')
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'Review stats'
+
+    def __str__(self):
+        return f'Review stats for {self.product}'
+
+    @property
+    def counts(self):
+        return [self.stars_1, self.stars_2, self.stars_3, self.stars_4, self.stars_5]
+
+    @property
+    def total(self):
+        return sum(self.counts)
+
+    @property
+    def average(self):
+        total = self.total
+        if total:
+            return round(sum(i * n for i, n in enumerate(self.counts, 1)) / total, 1)
+        return 0
+
+    def histogram(self):
+        total = self.total
+        return [
+            {'stars': stars, 'count': n, 'percent': round(n * 100 / total) if total else 0}
+            for stars, n in reversed(list(enumerate(self.counts, 1)))
+        ]
+
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -89,6 +224,12 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Used by archive_orders to find finished orders past the cutoff.
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+        ]
+
     def __str__(self):
         return f'Order #{self.id} by {self.user.username}'
 
@@ -110,6 +251,52 @@ class OrderItem(models.Model):
         return self.price * self.quantity
 
 
+# ── Order archive ─────────────────────────────────────────────────────────────
+# Delivered/cancelled orders past ORDER_ARCHIVE_AFTER_DAYS are moved here by the
+# archive_orders command, keeping their ids, so Order/OrderItem only hold the
+# recent, active part of the history. Field-for-field copies of Order and
+# OrderItem (without auto_now, so archived timestamps are preserved).
+
+class ArchivedOrder(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_orders')
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    shipping_name = models.CharField(max_length=200)
+    shipping_address = models.TextField()
+    shipping_city = models.CharField(max_length=100)
+    shipping_zip = models.CharField(max_length=20)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='archived_order_user_idx'),
+        ]
+
+    def __str__(self):
+        return f'Order #{self.id} by {self.user.username} (archived)'
+
+    def get_absolute_url(self):
+        return reverse('store:order_detail', kwargs={'pk': self.id})
+
+
+class ArchivedOrderItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    quantity = models.PositiveIntegerField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f'{self.quantity}x {self.product.name}'
+
+    @property
+    def total(self):
+        return self.price * self.quantity
+
+
 class Wishlist(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='wishlist')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -117,3 +304,52 @@ class Wishlist(models.Model):
 
     class Meta:
         unique_together = ('user', 'product')
+
+
+# ── Sales rollups ─────────────────────────────────────────────────────────────
+# Maintained incrementally by store/signals.py and rebuilt by the
+# rebuild_sales_rollups command. Cancelled orders are not counted. The foreign
+# keys carry no constraint so deleting a product or category (which cascades
+# to its order items and nets its rollup rows to zero) never has to wait on,
+# or race with, rollup writes; zeroed rows are removed by compaction.
+
+class DailySales(models.Model):
+    date = models.DateField(unique=True)
+    orders = models.IntegerField(default=0)
+    items = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name_plural = 'Daily sales'
+        ordering = ['-date']
+
+    def __str__(self):
+        return str(self.date)
+
+
+class ProductSales(models.Model):
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name_plural = 'Product sales'
+        unique_together = ('date', 'product')
+
+    def __str__(self):
+        return f'{self.product} on {self.date}'
+
+
+class CategorySales(models.Model):
+    date = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name_plural = 'Category sales'
+        unique_together = ('date', 'category')
+
+    def __str__(self):
+        return f'{self.category} on {self.date}'
@@ -0,0 +1,216 @@
+"""
+On-demand request profiler.
+
+A request is profiled when one of these holds:
+
+* it falls in the random sample (``PROFILER_SAMPLE_RATE``, 0.0-1.0),
+* it carries a valid signed ``X-Profile`` header (see ``make_token``), or
+* it comes from a staff user who switched profiling on for their session
+  on the profiler page.
+
+Profiled requests run under cProfile with every SQL query timed. The
+pstats dump and a JSON summary are written to ``PROFILER_DIR``; the oldest
+files are pruned beyond ``PROFILER_MAX_FILES`` / ``PROFILER_MAX_AGE_DAYS``.
+If the directory cannot be written the profile is dropped with a warning.
+With ``PROFILER_ENABLED`` off the middleware removes itself from the stack.
+"""
+import cProfile
+import json
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+HEADER = 'HTTP_X_PROFILE'
+SESSION_KEY = 'profile_requests'
+TOKEN_SALT = 'store.profiler'
+TOKEN_MAX_AGE = 3600
+
+logger = logging.getLogger(__name__)
+
+# cProfile cannot run two profilers at once in a process; concurrent
+# requests on threaded servers are simply not profiled.
+_lock = threading.Lock()
+
+
+def profile_dir():
+    return Path(getattr(settings, 'PROFILER_DIR', settings.BASE_DIR / 'profiles'))
+
+
+def make_token():
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign('profile')
+
+
+def valid_token(token):
+    try:
+        signing.TimestampSigner(salt=TOKEN_SALT).unsign(token, max_age=TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+class SQLRecorder:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    def summary(self, top=10):
+        grouped = defaultdict(lambda: [0, 0.0])
+        for sql, duration in self.queries:
+            grouped[sql][0] += 1
+            grouped[sql][1] += duration
+        slowest = sorted(grouped.items(), key=lambda item: -item[1][1])[:top]
+        return [{'sql': sql, 'count': n, 'ms': round(t * 1000, 3)} for sql, (n, t) in slowest]
+
+
+# ── Storage ───────────────────────────────────────────────────────────────────
+
+def save_profile(profiler, meta):
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    profiler.dump_stats(directory / f'{meta["id"]}.prof')
+    (directory / f'{meta["id"]}.json').write_text(json.dumps(meta))
+    prune()
+
+
+def prune():
+    directory = profile_dir()
+    max_files = getattr(settings, 'PROFILER_MAX_FILES', 200)
+    max_age = getattr(settings, 'PROFILER_MAX_AGE_DAYS', 7) * 86400
+    metas = sorted(directory.glob('*.json'), key=os.path.getmtime, reverse=True)
+    now = time.time()
+    for i, path in enumerate(metas):
+        if i >= max_files or now - path.stat().st_mtime > max_age:
+            path.unlink(missing_ok=True)
+            path.with_suffix('.prof').unlink(missing_ok=True)
+
+
+def load_profiles(url_name=None):
+    profiles = []
+    for path in profile_dir().glob('*.json'):
+        try:
+            meta = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        if url_name is None or meta['url_name'] == url_name:
+            profiles.append(meta)
+    return sorted(profiles, key=lambda m: m['created'], reverse=True)
+
+
+def _short_path(file):
+    if 'site-packages/' in file:
+        return file.split('site-packages/', 1)[1]
+    if file.startswith(str(settings.BASE_DIR)):
+        return os.path.relpath(file, settings.BASE_DIR)
+    return file
+
+
+def hot_functions(profiles, sort='tottime', limit=30):
+    """Merge the pstats of the given profiles; per-request averages of the top functions."""
+    paths = [str(profile_dir() / f'{m["id"]}.prof') for m in profiles]
+    paths = [p for p in paths if os.path.exists(p)]
+    if not paths:
+        return []
+    stats = pstats.Stats(*paths)
+    key = 2 if sort == 'tottime' else 3
+    rows = sorted(stats.stats.items(), key=lambda item: -item[1][key])[:limit]
+    n = len(paths)
+    return [{
+        'function': f'{_short_path(file)}:{line}({name})',
+        'calls': calls // n,
+        'tottime_ms': round(tottime * 1000 / n, 3),
+        'cumtime_ms': round(cumtime * 1000 / n, 3),
+    } for (file, line, name), (_, calls, tottime, cumtime, _) in rows]
+
+
+def sql_hotspots(profiles, limit=15):
+    grouped = defaultdict(lambda: {'count': 0, 'ms': 0.0})
+    for meta in profiles:
+        for q in meta['sql_top']:
+            grouped[q['sql']]['count'] += q['count']
+            grouped[q['sql']]['ms'] += q['ms']
+    n = len(profiles) or 1
+    rows = sorted(grouped.items(), key=lambda item: -item[1]['ms'])[:limit]
+    return [{'sql': sql, 'count': v['count'] / n, 'ms': round(v['ms'] / n, 3)} for sql, v in rows]
+
+
+# ── Middleware ────────────────────────────────────────────────────────────────
+
+class ProfilerMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILER_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PROFILER_SAMPLE_RATE', 0.0)
+
+    def trigger(self, request):
+        token = request.META.get(HEADER)
+        if token and valid_token(token):
+            return 'header'
+        if self.sample_rate and random.random() < self.sample_rate:
+            return 'sample'
+        if request.session.get(SESSION_KEY) and request.user.is_staff:
+            return 'staff'
+        return None
+
+    def __call__(self, request):
+        trigger = self.trigger(request)
+        if trigger is None or not _lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self.profile(request, trigger)
+        finally:
+            _lock.release()
+
+    def profile(self, request, trigger):
+        recorder = SQLRecorder()
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(recorder))
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        meta = {
+            'id': f'{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}',
+            'created': time.time(),
+            'url_name': match.view_name if match else '(unresolved)',
+            'path': request.path,
+            'method': request.method,
+            'status': response.status_code,
+            'trigger': trigger,
+            'duration_ms': round(duration * 1000, 3),
+            'sql_count': len(recorder.queries),
+            'sql_ms': round(sum(d for _, d in recorder.queries) * 1000, 3),
+            'sql_top': recorder.summary(),
+        }
+        # The request already succeeded; a full or read-only disk must not
+        # turn it into an error.
+        try:
+            save_profile(profiler, meta)
+        except OSError as e:
+            logger.warning('Could not save profile to %s: %s', profile_dir(), e)
+        return response
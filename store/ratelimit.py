@@ -0,0 +1,159 @@
+"""
+Token-bucket rate limiting for expensive endpoints.
+
+Rules are keyed by URL name in ``settings.RATELIMIT_RULES``::
+
+    RATELIMIT_RULES = {
+        'store:product_list': {'rate': '120/m', 'burst': 40, 'param_cost': {'q': 2}},
+        'store:checkout': {'rate': '10/m', 'methods': ['POST']},
+    }
+
+``rate`` is the refill rate, ``burst`` the bucket size (defaults to the rate's
+count), ``param_cost`` charges extra tokens when a query/form parameter is
+present, so filtered or search requests drain the bucket faster than plain
+page views. Buckets are per user when logged in, otherwise per client IP.
+
+Two backends: ``memory`` (per process, no I/O) and ``cache`` (the Django
+cache, shared between workers when CACHES points at a shared backend). The
+cache backend does a plain get/set, so concurrent hits for the same client
+can occasionally let a request or two through; that is fine for throttling.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+class Rule:
+    __slots__ = ('name', 'refill', 'capacity', 'param_cost', 'methods')
+
+    def __init__(self, name, rate, burst=None, param_cost=None, methods=None):
+        try:
+            count, period = rate.split('/')
+            count, period = int(count), PERIODS[period[0]]
+        except (ValueError, KeyError):
+            raise ImproperlyConfigured(f'Invalid rate {rate!r} for {name!r}; use e.g. "60/m"')
+        self.name = name
+        self.refill = count / period
+        self.capacity = burst or count
+        self.param_cost = dict(param_cost or {})
+        self.methods = frozenset(m.upper() for m in methods) if methods else None
+
+    def cost(self, request):
+        cost = 1
+        if self.param_cost:
+            params = request.GET if request.method == 'GET' else request.POST
+            for param, extra in self.param_cost.items():
+                if params.get(param):
+                    cost += extra
+        return min(cost, self.capacity)
+
+
+def take(state, rule, cost, now):
+    """Refill a (tokens, timestamp) bucket and try to take cost tokens.
+
+    Returns the new state and the seconds to wait (0 when allowed).
+    """
+    if state is None:
+        tokens = rule.capacity
+    else:
+        tokens = min(rule.capacity, state[0] + (now - state[1]) * rule.refill)
+    if tokens >= cost:
+        return (tokens - cost, now), 0
+    return (tokens, now), (cost - tokens) / rule.refill
+
+
+class MemoryBackend:
+    """Per-process buckets, kept in least-recently-used order.
+
+    Each entry is ``(state, full_at)``, where ``full_at`` is when the bucket
+    will have refilled under its own rule; past that it is equivalent to no
+    bucket at all.
+    """
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def hit(self, key, rule, cost):
+        now = time.time()
+        with self.lock:
+            entry = self.buckets.get(key)
+            state, wait = take(entry and entry[0], rule, cost, now)
+            self.buckets[key] = (state, now + (rule.capacity - state[0]) / rule.refill)
+            self.buckets.move_to_end(key)
+            if len(self.buckets) > 2 * self.max_keys:
+                self.prune(now)
+        return wait
+
+    def prune(self, now):
+        # Drop refilled buckets, then the least recently used ones until
+        # max_keys remain. Runs at most once per max_keys new clients, so
+        # the sweep is amortised O(1) per hit.
+        for key in [k for k, (_, full_at) in self.buckets.items() if full_at <= now]:
+            del self.buckets[key]
+        while len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+
+
+class CacheBackend:
+    def __init__(self, alias='default'):
+        self.cache = caches[alias]
+
+    def hit(self, key, rule, cost):
+        state, wait = take(self.cache.get(key), rule, cost, time.time())
+        self.cache.set(key, state, math.ceil(rule.capacity / rule.refill) + 1)
+        return wait
+
+
+BACKENDS = {'memory': MemoryBackend, 'cache': CacheBackend}
+
+
+def client_id(request):
+    if request.user.is_authenticated:
+        return f'u{request.user.pk}'
+    ip = request.META.get(getattr(settings, 'RATELIMIT_IP_META', 'REMOTE_ADDR'), '')
+    return f'ip{ip.split(",")[0].strip()}'
+
+
+def too_many_requests(wait):
+    response = HttpResponse('Too many requests. Please slow down.', status=429, content_type='text/plain')
+    response['Retry-After'] = str(max(1, math.ceil(wait)))
+    return response
+
+
+class RateLimitMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'RATELIMIT_ENABLED', True)
+        self.rules = {
+            name: Rule(name, **options)
+            for name, options in getattr(settings, 'RATELIMIT_RULES', {}).items()
+        }
+        backend = getattr(settings, 'RATELIMIT_BACKEND', 'cache')
+        if backend not in BACKENDS:
+            raise ImproperlyConfigured(f'RATELIMIT_BACKEND must be one of {", ".join(BACKENDS)}')
+        self.backend = BACKENDS[backend]()
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not self.enabled:
+            return None
+        rule = self.rules.get(request.resolver_match.view_name)
+        if rule is None or (rule.methods and request.method not in rule.methods):
+            return None
+        key = f'rl:{rule.name}:{client_id(request)}'
+        wait = self.backend.hit(key, rule, rule.cost(request))
+        if wait:
+            return too_many_requests(wait)
+        return None
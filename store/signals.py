@@ -0,0 +1,190 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import analytics, cache
+from .models import (
+    ArchivedOrder, ArchivedOrderItem, Category, Order, OrderItem, Product, Review, ReviewStats,
+)
+
+# Changing any of these can move a product in or out of a listing page (or
+# reorder it), so the listing keys have to be purged, not just the product's.
+LISTING_FIELDS = ('category_id', 'name', 'description', 'price', 'compare_price', 'is_featured', 'is_new')
+
+
+# ── Page cache purging ────────────────────────────────────────────────────────
+
+@receiver(pre_save, sender=Product)
+def remember_product_state(sender, instance, **kwargs):
+    instance._previous = None
+    if instance.pk:
+        instance._previous = (
+            Product.objects.filter(pk=instance.pk)
+            .values('stock', 'category__slug', *LISTING_FIELDS)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Product)
+def purge_product_pages(sender, instance, created, **kwargs):
+    keys = {cache.product_key(instance.pk)}
+    previous = getattr(instance, '_previous', None)
+    listing_changed = created or previous is None or (
+        (previous['stock'] > 0) != (instance.stock > 0)
+        or any(previous[f] != getattr(instance, f) for f in LISTING_FIELDS)
+    )
+    if listing_changed:
+        keys.update({'catalog', cache.category_key(instance.category.slug)})
+        if previous and previous['category__slug']:
+            keys.add(cache.category_key(previous['category__slug']))
+    transaction.on_commit(lambda: cache.purge(*keys))
+
+
+@receiver(post_delete, sender=Product)
+def purge_deleted_product_pages(sender, instance, **kwargs):
+    key = cache.product_key(instance.pk)
+    transaction.on_commit(lambda: cache.purge(key, 'catalog'))
+
+
+@receiver(pre_save, sender=Category)
+def remember_category_slug(sender, instance, **kwargs):
+    instance._previous_slug = None
+    if instance.pk:
+        instance._previous_slug = (
+            Category.objects.filter(pk=instance.pk).values_list('slug', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Category)
+def purge_category_pages(sender, instance, **kwargs):
+    keys = {'categories', cache.category_key(instance.slug)}
+    if getattr(instance, '_previous_slug', None):
+        keys.add(cache.category_key(instance._previous_slug))
+    transaction.on_commit(lambda: cache.purge(*keys))
+
+
+@receiver(post_delete, sender=Category)
+def purge_deleted_category_pages(sender, instance, **kwargs):
+    slug = instance.slug
+    transaction.on_commit(lambda: cache.purge('categories', 'catalog', cache.category_key(slug)))
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def purge_reviewed_product_pages(sender, instance, **kwargs):
+    transaction.on_commit(lambda: cache.purge(cache.product_key(instance.product_id)))
+
+
+# ── Review histogram ──────────────────────────────────────────────────────────
+
+def _bump_stars(product_id, rating, delta):
+    ReviewStats.objects.get_or_create(product_id=product_id)
+    field = f'stars_{rating}'
+    ReviewStats.objects.filter(product_id=product_id).update(**{field: F(field) + delta})
+
+
+@receiver(pre_save, sender=Review)
+def remember_review_state(sender, instance, **kwargs):
+    instance._previous = None
+    if instance.pk:
+        instance._previous = Review.objects.filter(pk=instance.pk).values('product_id', 'rating').first()
+
+
+@receiver(post_save, sender=Review)
+def update_review_stats(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous', None)
+    if previous:
+        if (previous['product_id'], previous['rating']) == (instance.product_id, instance.rating):
+            return
+        _bump_stars(previous['product_id'], previous['rating'], -1)
+    _bump_stars(instance.product_id, instance.rating, 1)
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_stats(sender, instance, **kwargs):
+    field = f'stars_{instance.rating}'
+    ReviewStats.objects.filter(product_id=instance.product_id, **{f'{field}__gt': 0}).update(
+        **{field: F(field) - 1}
+    )
+
+
+# ── Sales rollups ─────────────────────────────────────────────────────────────
+
+@receiver(pre_save, sender=Order)
+def remember_order_state(sender, instance, **kwargs):
+    instance._previous = None
+    if instance.pk:
+        instance._previous = Order.objects.filter(pk=instance.pk).values('status', 'total_price').first()
+
+
+@receiver(post_save, sender=Order)
+def update_order_rollups(sender, instance, created, **kwargs):
+    date = analytics.order_date(instance)
+    counted = analytics.is_counted(instance.status)
+    previous = getattr(instance, '_previous', None)
+    if created or previous is None:
+        if counted:
+            analytics.apply_order(date, instance.total_price)
+        return
+    was_counted = analytics.is_counted(previous['status'])
+    if was_counted == counted and previous['total_price'] == instance.total_price:
+        return
+    if was_counted:
+        analytics.apply_order(date, previous['total_price'], -1)
+    if counted:
+        analytics.apply_order(date, instance.total_price)
+    if was_counted != counted:
+        analytics.apply_order_items(instance, 1 if counted else -1)
+
+
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=ArchivedOrder)
+def remove_order_rollups(sender, instance, **kwargs):
+    if not analytics.is_paused() and analytics.is_counted(instance.status):
+        analytics.apply_order(analytics.order_date(instance), instance.total_price, -1)
+
+
+@receiver(pre_save, sender=OrderItem)
+def remember_order_item_state(sender, instance, **kwargs):
+    instance._previous = None
+    if instance.pk:
+        instance._previous = (
+            OrderItem.objects.filter(pk=instance.pk)
+            .values_list('product_id', 'product__category_id', 'quantity', 'price')
+            .first()
+        )
+
+
+def _counted_order_date(order_id, order_model=Order):
+    order = order_model.objects.filter(pk=order_id).only('status', 'created_at').first()
+    if order is None or not analytics.is_counted(order.status):
+        return None
+    return analytics.order_date(order)
+
+
+@receiver(post_save, sender=OrderItem)
+def update_order_item_rollups(sender, instance, **kwargs):
+    date = _counted_order_date(instance.order_id)
+    if date is None:
+        return
+    previous = getattr(instance, '_previous', None)
+    if previous:
+        analytics.apply_item(date, *previous, sign=-1)
+    analytics.apply_item(
+        date, instance.product_id, instance.product.category_id, instance.quantity, instance.price,
+    )
+
+
+@receiver(post_delete, sender=OrderItem)
+@receiver(post_delete, sender=ArchivedOrderItem)
+def remove_order_item_rollups(sender, instance, **kwargs):
+    if analytics.is_paused():
+        return
+    order_model = ArchivedOrder if sender is ArchivedOrderItem else Order
+    date = _counted_order_date(instance.order_id, order_model)
+    if date is not None:
+        analytics.apply_item(
+            date, instance.product_id, instance.product.category_id, instance.quantity, instance.price,
+            sign=-1,
+        )
@@ -25,4 +25,7 @@ urlpatterns = [
     path('register/', views.register_view, name='register'),
     path('logout/', views.logout_view, name='logout'),
     path('profile/', views.profile, name='profile'),
+
+    path('staff/profiler/', views.profiler_index, name='profiler'),
+    path('staff/profiler/<str:url_name>/', views.profiler_detail, name='profiler_detail'),
 ]
@@ -1,11 +1,22 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
+from django.conf import settings
 from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
 from django.contrib import messages
-from django.db.models import Q
-from .models import Product, Category, Order, OrderItem, Review, Wishlist
+from django.db.models import Count, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.http import Http404
+from .models import Product, Category, Order, OrderItem, Review, Wishlist, ArchivedOrder
 from .forms import ReviewForm, CheckoutForm, UserRegistrationForm
+from . import profiler as request_profiler
+from .cache import cache_anonymous_page, set_surrogate_keys, product_key, category_key
+from ecommerce.db.transaction import immediate_atomic
+import base64
+import binascii
 import json
 
 
@@ -27,21 +38,96 @@ def cart_total(cart, products):
     return total
 
 
+# ── Review pagination (keyset) ────────────────────────────────────────────────
+
+REVIEWS_PER_PAGE = 10
+
+# (field, descending) per sort; each matches an index on Review.
+REVIEW_SORTS = {
+    'recent': [('created_at', True), ('id', True)],
+    'highest': [('rating', True), ('created_at', True), ('id', True)],
+    'lowest': [('rating', False), ('created_at', True), ('id', True)],
+}
+CURSOR_RANGES = {'rating': (1, 5), 'id': (1, 2 ** 63 - 1)}
+
+
+def encode_cursor(review, fields):
+    values = [getattr(review, name) for name, _ in fields]
+    values = [v.isoformat() if hasattr(v, 'isoformat') else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor, fields):
+    """Cursor values, or None when the cursor is malformed or out of range."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if len(values) != len(fields):
+            return None
+        decoded = []
+        for (name, _), value in zip(fields, values):
+            if name == 'created_at':
+                value = parse_datetime(value)
+                # The database rejects aware datetimes without USE_TZ and vice versa.
+                if value is None or timezone.is_aware(value) != settings.USE_TZ:
+                    return None
+            else:
+                value = int(value)
+                low, high = CURSOR_RANGES[name]
+                if not low <= value <= high:
+                    return None
+            decoded.append(value)
+        return decoded
+    except (ValueError, TypeError, OverflowError, binascii.Error):
+        return None
+
+
+def keyset_after(fields, values):
+    """Q matching rows strictly after `values` in the (field, descending) ordering."""
+    q = Q()
+    for i, (name, descending) in enumerate(fields):
+        step = Q(**{f'{name}__{"lt" if descending else "gt"}': values[i]})
+        for (prev, _), value in zip(fields[:i], values[:i]):
+            step &= Q(**{prev: value})
+        q |= step
+    return q
+
+
+def review_page(product, sort, cursor):
+    fields = REVIEW_SORTS[sort]
+    reviews = product.reviews.select_related('user').order_by(
+        *[f'-{name}' if descending else name for name, descending in fields]
+    )
+    values = decode_cursor(cursor, fields) if cursor else None
+    if values:
+        reviews = reviews.filter(keyset_after(fields, values))
+    page = list(reviews[:REVIEWS_PER_PAGE + 1])
+    next_cursor = None
+    if len(page) > REVIEWS_PER_PAGE:
+        page = page[:REVIEWS_PER_PAGE]
+        next_cursor = encode_cursor(page[-1], fields)
+    return page, next_cursor
+
+
 # ── Pages ─────────────────────────────────────────────────────────────────────
 
+@cache_anonymous_page
 def home(request):
-    featured = Product.objects.filter(is_featured=True, stock__gt=0)[:8]
-    new_arrivals = Product.objects.filter(is_new=True, stock__gt=0)[:8]
+    products = Product.objects.select_related('category', 'review_stats')
+    featured = products.filter(is_featured=True, stock__gt=0)[:8]
+    new_arrivals = products.filter(is_new=True, stock__gt=0)[:8]
     categories = Category.objects.all()[:6]
-    return render(request, 'store/home.html', {
+    response = render(request, 'store/home.html', {
         'featured': featured,
         'new_arrivals': new_arrivals,
         'categories': categories,
     })
+    keys = [product_key(p.id) for p in list(featured) + list(new_arrivals)]
+    return set_surrogate_keys(response, keys + ['catalog', 'categories'])
 
 
+@cache_anonymous_page
 def product_list(request):
-    products = Product.objects.filter(stock__gt=0)
+    products = Product.objects.filter(stock__gt=0).select_related('category', 'review_stats')
     categories = Category.objects.all()
 
     cat_slug = request.GET.get('category')
@@ -49,6 +135,7 @@ def product_list(request):
     sort = request.GET.get('sort', 'newest')
     min_price = request.GET.get('min_price')
     max_price = request.GET.get('max_price')
+    on_sale = request.GET.get('on_sale') == '1'
 
     if cat_slug:
         products = products.filter(category__slug=cat_slug)
@@ -58,33 +145,46 @@ def product_list(request):
         products = products.filter(price__gte=min_price)
     if max_price:
         products = products.filter(price__lte=max_price)
+    if on_sale:
+        products = products.on_sale()
 
     sort_map = {
-        'newest': '-created_at',
-        'price_asc': 'price',
-        'price_desc': '-price',
-        'name': 'name',
+        'newest': ['-created_at'],
+        'price_asc': ['price'],
+        'price_desc': ['-price'],
+        'name': ['name'],
+        'discount': ['-discount_percent', '-created_at'],
     }
-    products = products.order_by(sort_map.get(sort, '-created_at'))
+    products = products.order_by(*sort_map.get(sort, ['-created_at']))
 
-    return render(request, 'store/product_list.html', {
+    response = render(request, 'store/product_list.html', {
         'products': products,
         'categories': categories,
         'current_category': cat_slug,
         'query': query,
         'sort': sort,
+        'on_sale': on_sale,
     })
+    keys = [product_key(p.id) for p in products]
+    return set_surrogate_keys(response, keys + ['catalog', 'categories'])
 
 
+@cache_anonymous_page
 def product_detail(request, slug):
-    product = get_object_or_404(Product, slug=slug)
-    reviews = product.reviews.select_related('user').order_by('-created_at')
-    related = Product.objects.filter(category=product.category).exclude(id=product.id)[:4]
+    product = get_object_or_404(Product.objects.select_related('category', 'review_stats'), slug=slug)
+    review_sort = request.GET.get('reviews', 'recent')
+    if review_sort not in REVIEW_SORTS:
+        review_sort = 'recent'
+    reviews, next_cursor = review_page(product, review_sort, request.GET.get('after'))
+    related = (
+        Product.objects.filter(category=product.category).exclude(id=product.id)
+        .select_related('category', 'review_stats')[:4]
+    )
     review_form = ReviewForm()
 
     user_review = None
     if request.user.is_authenticated:
-        user_review = reviews.filter(user=request.user).first()
+        user_review = Review.objects.filter(product=product, user=request.user).first()
 
     if request.method == 'POST' and request.user.is_authenticated:
         review_form = ReviewForm(request.POST)
@@ -100,20 +200,30 @@ def product_detail(request, slug):
     if request.user.is_authenticated:
         in_wishlist = Wishlist.objects.filter(user=request.user, product=product).exists()
 
-    return render(request, 'store/product_detail.html', {
+    response = render(request, 'store/product_detail.html', {
         'product': product,
         'reviews': reviews,
+        'review_stats': product.rating_stats,
+        'review_sort': review_sort,
+        'review_sorts': list(REVIEW_SORTS),
+        'next_cursor': next_cursor,
         'related': related,
         'review_form': review_form,
         'user_review': user_review,
         'in_wishlist': in_wishlist,
     })
+    keys = [product_key(product.id), category_key(product.category.slug)]
+    keys += [product_key(p.id) for p in related]
+    return set_surrogate_keys(response, keys)
 
 
+@cache_anonymous_page
 def category_view(request, slug):
     category = get_object_or_404(Category, slug=slug)
-    products = Product.objects.filter(category=category, stock__gt=0)
-    return render(request, 'store/category.html', {'category': category, 'products': products})
+    products = Product.objects.filter(category=category, stock__gt=0).select_related('category', 'review_stats')
+    response = render(request, 'store/category.html', {'category': category, 'products': products})
+    keys = [product_key(p.id) for p in products]
+    return set_surrogate_keys(response, keys + [category_key(slug)])
 
 
 # ── Cart ──────────────────────────────────────────────────────────────────────
@@ -170,20 +280,30 @@ def checkout(request):
     if request.method == 'POST':
         form = CheckoutForm(request.POST)
         if form.is_valid():
-            order = Order.objects.create(
-                user=request.user,
-                total_price=total,
-                shipping_name=form.cleaned_data['name'],
-                shipping_address=form.cleaned_data['address'],
-                shipping_city=form.cleaned_data['city'],
-                shipping_zip=form.cleaned_data['zip_code'],
-            )
-            for pid, qty in cart.items():
-                p = products.get(int(pid))
-                if p:
-                    OrderItem.objects.create(order=order, product=p, quantity=qty, price=p.price)
-                    p.stock -= qty
-                    p.save()
+            with immediate_atomic():
+                # Re-read the products under the write lock so the stock and
+                # prices written below are current, not the ones read for
+                # the form. select_for_update() is a no-op on SQLite, where
+                # BEGIN IMMEDIATE already serializes checkouts.
+                products = {
+                    p.id: p
+                    for p in Product.objects.select_for_update().filter(id__in=[int(k) for k in cart.keys()])
+                }
+                total = cart_total(cart, products)
+                order = Order.objects.create(
+                    user=request.user,
+                    total_price=total,
+                    shipping_name=form.cleaned_data['name'],
+                    shipping_address=form.cleaned_data['address'],
+                    shipping_city=form.cleaned_data['city'],
+                    shipping_zip=form.cleaned_data['zip_code'],
+                )
+                for pid, qty in cart.items():
+                    p = products.get(int(pid))
+                    if p:
+                        OrderItem.objects.create(order=order, product=p, quantity=qty, price=p.price)
+                        p.stock -= qty
+                        p.save()
             request.session['cart'] = {}
             messages.success(request, 'Order placed successfully!')
             return redirect('store:order_detail', pk=order.id)
@@ -193,16 +313,40 @@ def checkout(request):
     return render(request, 'store/checkout.html', {'form': form, 'cart': cart, 'products': products, 'total': total})
 
 
+# Recent orders live in Order; finished ones are moved to ArchivedOrder by
+# archive_orders. Reads go to the hot table first and fall back to the archive.
+
+def user_orders(user, limit=None):
+    hot = Order.objects.filter(user=user).annotate(item_count=Count('items')).order_by('-created_at')
+    orders = list(hot[:limit] if limit else hot)
+    if limit and len(orders) >= limit:
+        return orders
+    archived = (
+        ArchivedOrder.objects.filter(user=user).annotate(item_count=Count('items')).order_by('-created_at')
+    )
+    if limit:
+        archived = archived[:limit - len(orders)]
+    return sorted(orders + list(archived), key=lambda o: o.created_at, reverse=True)
+
+
+def user_order_count(user):
+    return Order.objects.filter(user=user).count() + ArchivedOrder.objects.filter(user=user).count()
+
+
 @login_required
 def order_detail(request, pk):
-    order = get_object_or_404(Order, pk=pk, user=request.user)
+    order = Order.objects.filter(pk=pk, user=request.user).first()
+    if order is None:
+        order = ArchivedOrder.objects.filter(pk=pk, user=request.user).first()
+    if order is None:
+        raise Http404('No order matches the given query.')
     return render(request, 'store/order_detail.html', {'order': order})
 
 
 @login_required
 def order_list(request):
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
-    return render(request, 'store/order_list.html', {'orders': orders})
+    orders = user_orders(request.user)
+    return render(request, 'store/order_list.html', {'orders': orders, 'order_count': len(orders)})
 
 
 # ── Wishlist ──────────────────────────────────────────────────────────────────
@@ -255,5 +399,59 @@ def logout_view(request):
 
 @login_required
 def profile(request):
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')[:5]
-    return render(request, 'store/profile.html', {'orders': orders})
+    orders = user_orders(request.user, limit=5)
+    return render(request, 'store/profile.html', {
+        'orders': orders,
+        'order_count': user_order_count(request.user),
+    })
+
+
+# ── Profiler (staff) ──────────────────────────────────────────────────────────
+
+@staff_member_required
+def profiler_index(request):
+    if request.method == 'POST':
+        request.session[request_profiler.SESSION_KEY] = not request.session.get(request_profiler.SESSION_KEY)
+        return redirect('store:profiler')
+
+    profiles = request_profiler.load_profiles()
+    by_url = {}
+    for meta in profiles:
+        row = by_url.setdefault(meta['url_name'], {'url_name': meta['url_name'], 'count': 0, 'ms': 0, 'sql_ms': 0})
+        row['count'] += 1
+        row['ms'] += meta['duration_ms']
+        row['sql_ms'] += meta['sql_ms']
+    for row in by_url.values():
+        row['avg_ms'] = row['ms'] / row['count']
+        row['avg_sql_ms'] = row['sql_ms'] / row['count']
+
+    return render(request, 'store/profiler/index.html', {
+        **admin.site.each_context(request),
+        'title': 'Request profiler',
+        'enabled': settings.PROFILER_ENABLED,
+        'sample_rate': settings.PROFILER_SAMPLE_RATE,
+        'profiling_me': request.session.get(request_profiler.SESSION_KEY, False),
+        'token': request_profiler.make_token(),
+        'urls': sorted(by_url.values(), key=lambda r: -r['avg_ms']),
+        'recent': profiles[:50],
+    })
+
+
+@staff_member_required
+def profiler_detail(request, url_name):
+    profiles = request_profiler.load_profiles(url_name)
+    if not profiles:
+        raise Http404('No profiles for this URL.')
+    sort = 'cumtime' if request.GET.get('sort') == 'cumtime' else 'tottime'
+    return render(request, 'store/profiler/detail.html', {
+        **admin.site.each_context(request),
+        'title': f'Profiles: {url_name}',
+        'url_name': url_name,
+        'sort': sort,
+        'count': len(profiles),
+        'avg_ms': sum(m['duration_ms'] for m in profiles) / len(profiles),
+        'avg_sql_ms': sum(m['sql_ms'] for m in profiles) / len(profiles),
+        'avg_sql_count': sum(m['sql_count'] for m in profiles) / len(profiles),
+        'functions': request_profiler.hot_functions(profiles, sort),
+        'queries': request_profiler.sql_hotspots(profiles),
+    })